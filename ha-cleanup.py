@@ -7,7 +7,7 @@ Features:
   - Remove orphaned entities (missing device/config/automation/script/scene)
   - Fix numeric suffix issues (_2, _3, etc.) on entity IDs
   - Clean deleted_entities and deleted_devices from registries
-  - Purge old states/events and vacuum database
+  - Purge old states/events (full VACUUM is opt-in via --vacuum)
   - Restore entities from backup files (selective or full restore)
   - Auto-detects recorder purge_keep_days from HA config
   - Auto-detects config path (HAOS, Docker, Core)
@@ -15,28 +15,46 @@ Features:
 Usage:
   python3 ha-cleanup.py              # Interactive menu
   python3 ha-cleanup.py --dry-run    # Preview all changes
+  python3 ha-cleanup.py --vacuum     # Also VACUUM the database after purging
+                                     # (--repack works too, as in recorder.purge)
 """
 from __future__ import annotations
 
 import fcntl
+import hashlib
+import itertools
 import json
 import logging
+import mmap
 import os
+import pickle
 import re
 import shutil
 import sqlite3
+import stat
 import subprocess
 import sys
+import tempfile
 import time
+from concurrent.futures import Future, ThreadPoolExecutor
 from contextlib import contextmanager
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from datetime import datetime, timedelta
+from operator import attrgetter
 from pathlib import Path
 from typing import TYPE_CHECKING, Any
 
 if TYPE_CHECKING:
     from collections.abc import Callable, Generator
 
+try:
+    # C-accelerated JSON (ships with Home Assistant); stdlib json is the fallback
+    import orjson
+
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
 VERSION = "1.5.0"
 
 # Configure logging
@@ -83,24 +101,98 @@ AUTOMATION_PATH = CONFIG_PATH / "automation"
 SCRIPT_PATH = CONFIG_PATH / "scripts"
 SCENE_PATH = CONFIG_PATH / "scenes"
 
+# Where each definition platform's IDs live: (folder, root YAML, .storage file)
+DEFINITION_SOURCES: dict[str, tuple[Path, str, str]] = {
+    "automation": (AUTOMATION_PATH, "automations.yaml", "automations"),
+    "script": (SCRIPT_PATH, "scripts.yaml", "scripts"),
+    "scene": (SCENE_PATH, "scenes.yaml", "scenes"),
+}
+
 # Defaults
 DEFAULT_PURGE_DAYS = 14
 BACKUP_RETENTION_DAYS = 7
+BACKUP_KEEP_LAST = 3  # Newest backups per file kept regardless of age
 ENTITY_COUNT_DIFF_WARNING_THRESHOLD = 50  # Warn if backup differs by >50%
-HA_STOP_WAIT_SECONDS = 5
+HA_STOP_WAIT_SECONDS = 5  # Max wait for HA to let go of its files after stopping
+HA_STOP_POLL_SECONDS = 0.25
+IO_WORKERS = 8  # Threads for overlapping independent file reads
+YAML_MMAP_MIN_BYTES = 8192  # Scan YAML files at least this big via mmap instead of a read
+JSON_CACHE_MAX_ENTRIES = 32  # Parsed JSON files kept in memory (least recently used dropped)
+PURGE_BATCH_SIZE = 100_000  # Rows per DELETE transaction (bounds lock time and WAL size)
+CHECKPOINT_EVERY_BATCHES = 5  # Passive WAL checkpoint after this many batches
+
+# SQLite tuning for the purge session (HA is stopped, so we can trade
+# durability of the in-flight transaction for throughput). Connection-local
+# only: also applied to read-only dry runs
+SQLITE_PURGE_PRAGMAS = (
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-262144",  # 256 MiB page cache
+    "PRAGMA mmap_size=1073741824",  # 1 GiB memory-mapped I/O
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA foreign_keys=OFF",  # Legacy states.event_id FK must not block event deletes
+)
+# Only for sessions that modify the database (never dry runs, where HA is running)
+SQLITE_WRITE_PRAGMAS = (
+    "PRAGMA locking_mode=EXCLUSIVE",  # Lock once; WAL index in heap memory, no -shm
+    "PRAGMA journal_mode=WAL",  # Persistent: stored in the database file
+    "PRAGMA journal_size_limit=67108864",  # Truncate -wal back to 64 MiB on checkpoint
+    "PRAGMA secure_delete=OFF",  # Some SQLite builds zero freed pages by default
+)
+
+# A full VACUUM rewrites the whole database file (needs 2x disk space and
+# can take minutes), and freed pages get reused anyway — only run it on request
+VACUUM_REQUESTED = "--vacuum" in sys.argv or "--repack" in sys.argv
+VACUUM_HINT_FREE_RATIO = 0.25  # Suggest --vacuum when this share of the file is free
+INCREMENTAL_VACUUM_PAGES = 10_000  # Pages reclaimed per run with auto_vacuum=INCREMENTAL
+AUTO_VACUUM_FULL = 1  # PRAGMA auto_vacuum values
+AUTO_VACUUM_INCREMENTAL = 2
+VACUUM_MIN_FREE_MB = 50  # Skip a requested VACUUM if it would reclaim less
+
+# Indexes the purge relies on: (table, column, index name used by HA).
+# The timestamp ones drive the age deletes; the reference ones let the
+# live-ID sets for orphan cleanup come from a covering index scan.
+PURGE_INDEXES = (
+    ("states", "last_updated_ts", "ix_states_last_updated_ts"),
+    ("events", "time_fired_ts", "ix_events_time_fired_ts"),
+    ("states", "attributes_id", "ix_states_attributes_id"),
+    ("events", "data_id", "ix_events_data_id"),
+)
+
+# Ways to stop/start HA, tried in order: method -> (stop command, start command)
+HA_CONTROL_COMMANDS: dict[str, tuple[list[str], list[str]]] = {
+    "ha": (["ha", "core", "stop"], ["ha", "core", "start"]),
+    "systemctl": (
+        ["systemctl", "stop", "home-assistant@homeassistant"],
+        ["systemctl", "start", "home-assistant@homeassistant"],
+    ),
+    "docker": (
+        ["docker", "stop", "homeassistant"],
+        ["docker", "start", "homeassistant"],
+    ),
+}
+# Only methods whose tool is on PATH (saves a failed fork/exec per missing tool)
+AVAILABLE_HA_METHODS = tuple(
+    method for method, (stop_cmd, _) in HA_CONTROL_COMMANDS.items()
+    if shutil.which(stop_cmd[0])
+)
 
 # Regex patterns (compiled at module level for performance)
-NUMERIC_SUFFIX_PATTERN = re.compile(r"_(\d+)$")
-YAML_ID_PATTERN = re.compile(r'(?:^|\n)\s*-?\s*id:\s*["\']?([^"\'\n\r]+)["\']?')
+YAML_ID_PATTERN = re.compile(rb'(?:^|\n)\s*-?\s*id:\s*["\']?([^"\'\n\r]+)["\']?')  # bytes
 BACKUP_PATTERN = re.compile(r"\.backup\.(\d{8}_\d{6})$")
-DUPLICATE_SUFFIX_PATTERN = re.compile(r"_([2-9]|\d{2,})$")
+SELECTION_PART_PATTERN = re.compile(r"\+?(\d+)(?:-\+?(\d+))?")  # "5", "+5" or "1-5"
+
+# Entity attributes that mark a backup entity as modified (in display order)
+ENTITY_COMPARE_ATTRS = (
+    "platform", "device_id", "config_entry_id", "original_name", "disabled_by",
+)
 
 
 # ============================================================
 # Data Structures
 # ============================================================
 
-@dataclass
+@dataclass(slots=True)
 class BackupInfo:
     """Backup file metadata."""
 
@@ -120,44 +212,115 @@ class EntityDiff:
     modified: list[tuple[dict[str, Any], dict[str, Any]]]  # (backup, current)
 
 
+@dataclass
+class RegistryBatch:
+    """Registry backups and writes coalesced by registry_batch()."""
+
+    pending: dict[Path, dict[str, Any]] = field(default_factory=dict)  # path -> data to write
+    backups: dict[Path, Path] = field(default_factory=dict)  # path -> backup made for it
+
+
 # ============================================================
-# Simple Cache for JSON files
+# Simple Cache for parsed files
 # ============================================================
 
-_json_cache: dict[Path, tuple[float, dict[str, Any]]] = {}  # path -> (mtime, data)
+FileFingerprint = tuple[int, int, int]  # (st_mtime_ns, st_size, st_ino)
+ContentDigest = bytes  # BLAKE2b of the raw file content
 
+# path -> (fingerprint, digest, data)
+_json_cache: dict[Path, tuple[FileFingerprint, ContentDigest, dict[str, Any]]] = {}
+_yaml_ids_cache: dict[Path, tuple[FileFingerprint, set[str]]] = {}  # path -> (fingerprint, ids)
+# path -> (fingerprint, purge_keep_days found in it or None)
+_purge_days_cache: dict[Path, tuple[FileFingerprint, int | None]] = {}
 
-def _get_cached_json(path: Path) -> dict[str, Any] | None:
-    """Get cached JSON if file hasn't changed."""
-    if path not in _json_cache:
-        return None
 
+def _fingerprint(path: Path) -> FileFingerprint | None:
+    """Get (mtime_ns, size, inode) of a file, or None if it can't be stat'ed.
+
+    The inode catches atomic replaces (HA and this tool both write via
+    rename) even when a coarse-mtime filesystem and an unchanged size
+    would otherwise hide them.
+    """
     try:
-        current_mtime = path.stat().st_mtime
-        cached_mtime, cached_data = _json_cache[path]
-        if current_mtime == cached_mtime:
-            return cached_data
+        st = path.stat()
     except OSError:
-        pass
+        return None
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
 
-    return None
 
+def _content_digest(content: bytes | memoryview) -> ContentDigest:
+    """Hash file content for cache validation (fast, C-implemented)."""
+    return hashlib.blake2b(content, digest_size=16).digest()
 
-def _cache_json(path: Path, data: dict[str, Any]) -> None:
-    """Cache JSON data with file mtime."""
+
+# Backup entity counts persisted between runs. Loading them with pickle
+# runs code from the file, so the cache lives in a private per-user
+# directory (never /tmp) and is only read when that directory and file
+# are ours.
+PRIVATE_CACHE_DIR = (
+    Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache") / "ha-cleanup"
+)
+BACKUP_COUNTS_CACHE_NAME = "backup-counts.pickle"
+
+
+def _private_cache_dir() -> Path | None:
+    """Return the private cache directory if it is safe to use, creating it if needed."""
     try:
-        mtime = path.stat().st_mtime
-        _json_cache[path] = (mtime, data)
+        PRIVATE_CACHE_DIR.mkdir(mode=0o700, parents=True, exist_ok=True)
+        st = PRIVATE_CACHE_DIR.lstat()
     except OSError:
-        pass
+        return None
+    if (
+        not stat.S_ISDIR(st.st_mode)
+        or st.st_uid != os.geteuid()
+        or st.st_mode & (stat.S_IWGRP | stat.S_IWOTH)
+    ):
+        return None
+    return PRIVATE_CACHE_DIR
+
+
+def _read_private_cache(cache_file: Path) -> Any:  # noqa: ANN401 — whatever was stored
+    """Unpickle a cache file, or return None if it is missing, unsafe or unreadable."""
+    try:
+        with cache_file.open("rb") as f:
+            st = os.fstat(f.fileno())
+            if st.st_uid != os.geteuid() or st.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+                return None
+            # Only our own, non-shared file in our private directory gets here
+            return pickle.load(f)  # noqa: S301
+    except Exception:  # noqa: BLE001 — a bad cache entry is just a miss
+        return None
+
+
+def _write_private_cache(cache_file: Path, value: object) -> bool:
+    """Atomically pickle value to a cache file; returns False if that failed."""
+    fd, temp_name = tempfile.mkstemp(dir=cache_file.parent, suffix=".tmp")  # Created 0600
+    try:
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_name, cache_file)
+    except Exception:  # noqa: BLE001 — caching is best effort
+        Path(temp_name).unlink(missing_ok=True)
+        return False
+    return True
+
+
+_active_batch: RegistryBatch | None = None
+
+# path -> (fingerprint when backed up, backup); lives for the whole run
+_session_backups: dict[Path, tuple[FileFingerprint, Path]] = {}
 
 
 def invalidate_cache(path: Path | None = None) -> None:
-    """Invalidate JSON cache for specific path or all."""
+    """Invalidate parsed-file caches for specific path or all."""
     if path:
         _json_cache.pop(path, None)
+        _yaml_ids_cache.pop(path, None)
+        _purge_days_cache.pop(path, None)
     else:
         _json_cache.clear()
+        _yaml_ids_cache.clear()
+        _purge_days_cache.clear()
 
 
 # ============================================================
@@ -170,98 +333,343 @@ def log(msg: str) -> None:
 
 
 def backup_file(path: Path) -> Path:
-    """Create a timestamped backup of a file."""
-    if not path.exists():
+    """Create a timestamped backup of a file.
+
+    The backup is a hard link when possible (no data copied). That is safe
+    because registries are only ever replaced by rename — by HA and by this
+    tool — never rewritten in place, so the linked inode stays unchanged.
+
+    Inside registry_batch(), each file is only backed up once: writes are
+    deferred, so the first backup already holds the pre-batch content.
+    Across operations, a file that hasn't changed since this session last
+    backed it up reuses that backup. An existing backup is never
+    overwritten: a same-second name moves on to the next free second.
+    """
+    if _active_batch is not None and path in _active_batch.backups:
+        return _active_batch.backups[path]
+    fingerprint = _fingerprint(path)
+    if fingerprint is None:
         msg = f"Cannot backup non-existent file: {path}"
         raise FileNotFoundError(msg)
-    backup = Path(f"{path}.backup.{datetime.now(tz=None).strftime('%Y%m%d_%H%M%S')}")  # noqa: DTZ005 — local time intentional
-    shutil.copy2(path, backup)
+
+    previous = _session_backups.get(path)
+    if previous is not None and previous[0] == fingerprint and previous[1].exists():
+        backup = previous[1]
+    else:
+        stamp = datetime.now(tz=None)  # noqa: DTZ005 — local time intentional
+        backup = Path(f"{path}.backup.{stamp.strftime('%Y%m%d_%H%M%S')}")
+        while os.path.lexists(backup):
+            stamp += timedelta(seconds=1)
+            backup = Path(f"{path}.backup.{stamp.strftime('%Y%m%d_%H%M%S')}")
+        try:
+            os.link(path, backup)
+        except OSError:
+            # Cross-device or no hard link support
+            shutil.copy2(path, backup)
+        _session_backups[path] = (fingerprint, backup)
+
+    if _active_batch is not None:
+        _active_batch.backups[path] = backup
     return backup
 
 
+@contextmanager
+def registry_batch() -> Generator[RegistryBatch, None, None]:
+    """Batch registry writes across several cleanup operations.
+
+    While active, save_json() only records the new content and load_json()
+    returns it, so later operations see earlier changes. Each modified file
+    is written once on exit, with all of them fsynced before any is renamed
+    into place; if the block raises, nothing is written.
+    Nested use joins the outer batch.
+    """
+    global _active_batch  # noqa: PLW0603 — single module-level batch
+    if _active_batch is not None:
+        yield _active_batch
+        return
+
+    batch = RegistryBatch()
+    _active_batch = batch
+    try:
+        yield batch
+    finally:
+        _active_batch = None
+
+    if batch.pending:
+        _write_json_files(batch.pending)
+
+
 def load_json(path: Path, use_cache: bool = True) -> dict[str, Any]:
-    """Load JSON file with error handling and optional caching."""
-    if not path.exists():
+    """Load JSON file with error handling and optional caching.
+
+    The cache is checked by fingerprint first. If that changed but the
+    content hash didn't (HA re-saving identical data), the cached parse
+    is reused. With use_cache, the returned dict is shared with later callers: treat it
+    as read-only and save changes as a new (shallow-copied) dict.
+    """
+    if _active_batch is not None and path in _active_batch.pending:
+        return _active_batch.pending[path]
+
+    # One stat serves as existence check, cache check and cache key; taken
+    # before reading, so a concurrent write can't be masked
+    fingerprint = _fingerprint(path)
+    if fingerprint is None:
         msg = f"File not found: {path}"
         raise FileNotFoundError(msg)
 
     # Check cache first
-    if use_cache:
-        cached = _get_cached_json(path)
-        if cached is not None:
-            return cached
+    cached = _json_cache.get(path) if use_cache else None
+    if cached is not None and cached[0] == fingerprint:
+        _json_cache[path] = _json_cache.pop(path, cached)  # Mark most recently used
+        return cached[2]
 
     try:
-        with path.open(encoding="utf-8") as f:
-            data: dict[str, Any] = json.load(f)
-            if use_cache:
-                _cache_json(path, data)
-            return data
-    except json.JSONDecodeError as e:
+        data, digest = _read_json_file(path, cached[1:] if cached else None)
+    except json.JSONDecodeError as e:  # orjson.JSONDecodeError is a subclass
         msg = f"Invalid JSON in {path}: {e}"
         raise ValueError(msg) from e
 
+    if use_cache:
+        _cache_json(path, fingerprint, digest, data)
+    return data
+
+
+def _cache_json(
+    path: Path, fingerprint: FileFingerprint, digest: ContentDigest, data: dict[str, Any],
+) -> None:
+    """Store a parsed file as the most recently used cache entry."""
+    _json_cache.pop(path, None)
+    _json_cache[path] = (fingerprint, digest, data)
+    while len(_json_cache) > JSON_CACHE_MAX_ENTRIES:
+        # Dicts keep insertion order: the first key is least recently used
+        _json_cache.pop(next(iter(_json_cache)), None)
+
+
+def _read_json_file(
+    path: Path,
+    known: tuple[ContentDigest, dict[str, Any]] | None = None,
+) -> tuple[dict[str, Any], ContentDigest]:
+    """Read and parse a JSON file, returning (data, content digest).
+
+    known is a previously parsed (digest, data) of the same file: if the
+    content still has that digest, its data is returned unparsed. With orjson,
+    the file is hashed and parsed straight from a read-only mmap, so a
+    multi-MB registry is never held as a bytes copy next to its parsed
+    form. That is safe against HA rewriting the file, since HA (like this
+    script) replaces .storage files rather than truncating them.
+    """
+    known_digest, known_data = known if known else (None, None)
+    with path.open("rb") as f:
+        if HAS_ORJSON and os.fstat(f.fileno()).st_size:  # mmap rejects empty files
+            with (
+                mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm,
+                memoryview(mm) as view,
+            ):
+                digest = _content_digest(view)
+                if known_data is not None and digest == known_digest:
+                    return known_data, digest
+                return orjson.loads(view), digest
+        content = f.read()
+
+    digest = _content_digest(content)
+    if known_data is not None and digest == known_digest:
+        return known_data, digest
+    if HAS_ORJSON:
+        return orjson.loads(content), digest  # Empty file: raises JSONDecodeError
+    return json.loads(content.decode("utf-8")), digest
+
+
+def _serialize_json(data: dict[str, Any]) -> bytes:
+    """Serialize data the way HA writes .storage files (2-space indent, UTF-8)."""
+    if HAS_ORJSON:
+        # Equivalent to json.dumps for registry content (strings, bools,
+        # 64-bit ints, finite floats); OPT_NON_STR_KEYS stringifies int/etc.
+        # keys like json.dumps does
+        try:
+            return orjson.dumps(
+                data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS,
+            )
+        except orjson.JSONEncodeError:  # e.g. ints beyond 64 bits: json can write them
+            pass
+    return json.dumps(data, indent=2, ensure_ascii=False).encode("utf-8")
+
 
 def save_json(path: Path, data: dict[str, Any]) -> None:
-    """Save data to JSON file with atomic write and file locking.
+    """Save data to JSON file, deferred until exit inside registry_batch()."""
+    if _active_batch is not None:
+        _active_batch.pending[path] = data
+        return
+    _write_json(path, data)
+
+
+def _write_json(path: Path, data: dict[str, Any]) -> None:
+    """Write data to JSON file with atomic write and file locking."""
+    _write_json_files({path: data})
+
+
+def _write_json_files(files: dict[Path, dict[str, Any]]) -> None:
+    """Write JSON files atomically, as one group.
 
     This prevents race conditions when HA might be writing to the same file.
-    Uses a temporary file + atomic rename pattern.
+    Each file goes to a uniquely named temporary file in the same directory
+    (see _stage_json). Only once all of them are written and fsynced are
+    they renamed into place, so a staging failure leaves every file
+    untouched. The directories of renamed files are then fsynced once each
+    to make the renames durable, even if a later rename failed. Afterwards
+    the cache holds data for the new files, so the next load_json()
+    doesn't read back what was just written.
     """
-    temp_path = Path(f"{path}.tmp.{os.getpid()}")
+    staged: list[tuple[Path, Path, FileFingerprint, ContentDigest]] = []
+    renamed_dirs: set[Path] = set()
+    try:
+        for path, data in files.items():
+            staged.append((path, *_stage_json(path, data)))
+
+        for path, temp_path, _, _ in staged:
+            try:
+                os.replace(temp_path, path)  # Atomic rename (POSIX guarantees atomicity)
+            except OSError as e:
+                msg = f"Failed to save JSON to {path}: {e}"
+                raise ValueError(msg) from e
+            renamed_dirs.add(path.parent)
+    finally:
+        # Clean up temp files not renamed (no-op for the others)
+        for _, temp_path, _, _ in staged:
+            temp_path.unlink(missing_ok=True)
+        for directory in renamed_dirs:
+            _fsync_directory(directory)
+
+    # Cache what was written instead of re-reading it
+    for path, _, fingerprint, digest in staged:
+        invalidate_cache(path)
+        _cache_json(path, fingerprint, digest, files[path])
+
+
+def _stage_json(
+    path: Path, data: dict[str, Any],
+) -> tuple[Path, FileFingerprint, ContentDigest]:
+    """Write data to a fsynced temp file next to path.
+
+    Returns (temp path, fingerprint, digest) of the written file. The
+    original permissions are applied before the rename so the file is
+    never visible with the wrong mode. Data is serialized up front, so the
+    lock is only held for one write and a serialization error never
+    touches the disk.
+    """
+    try:
+        payload = _serialize_json(data)
+    except (TypeError, ValueError) as e:
+        msg = f"Failed to save JSON to {path}: {e}"
+        raise ValueError(msg) from e
 
+    # Preserve original file permissions (mkstemp creates files as 0600)
     try:
-        with temp_path.open("w", encoding="utf-8") as f:
+        original_mode: int | None = stat.S_IMODE(path.stat().st_mode)
+    except OSError:
+        original_mode = None
+
+    fd, temp_name = tempfile.mkstemp(
+        dir=path.parent, prefix=f".{path.name}.", suffix=".tmp",
+    )
+    temp_path = Path(temp_name)
+
+    try:
+        with os.fdopen(fd, "wb") as f:
             # Acquire exclusive lock (blocks if HA is writing)
             fcntl.flock(f.fileno(), fcntl.LOCK_EX)
             try:
-                json.dump(data, f, indent=2, ensure_ascii=False)
+                f.write(payload)  # One write() of the whole payload
                 f.flush()
+                if original_mode is not None:
+                    os.fchmod(f.fileno(), original_mode)
                 os.fsync(f.fileno())  # Force write to disk
+                # Rename keeps inode and mtime: this is the new file's fingerprint
+                st = os.fstat(f.fileno())
             finally:
                 fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    except Exception as e:
+        # Clean up temp file on error
+        temp_path.unlink(missing_ok=True)
+        msg = f"Failed to save JSON to {path}: {e}"
+        raise ValueError(msg) from e
 
-        # Preserve original file permissions
-        try:
-            original_mode = path.stat().st_mode
-        except OSError:
-            original_mode = None
+    return temp_path, (st.st_mtime_ns, st.st_size, st.st_ino), _content_digest(payload)
 
-        # Atomic rename (POSIX guarantees atomicity)
-        temp_path.replace(path)
 
-        # Restore permissions if we had them
-        if original_mode is not None:
-            path.chmod(original_mode)
+def _fsync_directory(directory: Path) -> None:
+    """Persist renames in a directory (best effort: not every filesystem supports it)."""
+    try:
+        fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
 
-        # Invalidate cache after write
-        invalidate_cache(path)
 
-    except Exception as e:
-        # Clean up temp file on error
-        if temp_path.exists():
-            temp_path.unlink()
-        msg = f"Failed to save JSON to {path}: {e}"
-        raise ValueError(msg) from e
+def replace_with_copy(src: Path, dst: Path) -> None:
+    """Replace dst with a copy of src via temp file + atomic rename.
+
+    Never writes into dst's existing inode, which may be shared with a
+    hard-linked backup. Only the data is copied (in the kernel where the
+    platform allows); the result keeps dst's permissions, gets a fresh
+    mtime, and is fsynced before the rename like _write_json() output.
+    """
+    try:
+        mode = stat.S_IMODE(dst.stat().st_mode)
+    except OSError:  # No dst yet: take the backup's
+        mode = stat.S_IMODE(src.stat().st_mode)
+
+    fd, temp_name = tempfile.mkstemp(
+        dir=dst.parent, prefix=f".{dst.name}.", suffix=".tmp",
+    )
+    os.close(fd)
+    temp_path = Path(temp_name)
+    try:
+        shutil.copyfile(src, temp_path)  # sendfile() on Linux
+        with temp_path.open("rb+") as f:
+            os.fchmod(f.fileno(), mode)
+            os.fsync(f.fileno())
+        os.replace(temp_path, dst)
+    finally:
+        temp_path.unlink(missing_ok=True)
+    _fsync_directory(dst.parent)
+    invalidate_cache(dst)
 
 
 def get_db_size() -> float:
     """Get database size in MB."""
-    if DB_PATH.exists():
+    try:
         return DB_PATH.stat().st_size / (1024 * 1024)
-    return 0.0
+    except OSError:
+        return 0.0
+
+
+# Output of the HA control tools is never shown: discard it rather than
+# capturing it through pipes
+_QUIET: dict[str, Any] = {
+    "stdin": subprocess.DEVNULL,
+    "stdout": subprocess.DEVNULL,
+    "stderr": subprocess.DEVNULL,
+}
+
+
+# Method that last stopped HA in this run; tried first next time
+_ha_control_method: str | None = None
 
 
 def stop_ha() -> str | None:
     """Stop Home Assistant using available method."""
-    methods = [
-        (["ha", "core", "stop"], "ha"),
-        (["systemctl", "stop", "home-assistant@homeassistant"], "systemctl"),
-        (["docker", "stop", "homeassistant"], "docker"),
-    ]
-    for cmd, method in methods:
+    global _ha_control_method  # noqa: PLW0603 — remembered for the whole run
+    methods = sorted(AVAILABLE_HA_METHODS, key=lambda m: m != _ha_control_method)
+    for method in methods:
+        cmd = HA_CONTROL_COMMANDS[method][0]
         try:
-            subprocess.run(cmd, check=True, capture_output=True, timeout=60)
+            subprocess.run(cmd, check=True, timeout=60, **_QUIET)
+            _ha_control_method = method
             return method
         except (
             subprocess.CalledProcessError,
@@ -274,20 +682,51 @@ def stop_ha() -> str | None:
 
 def start_ha(method: str) -> bool:
     """Start Home Assistant using specified method."""
-    cmds = {
-        "ha": ["ha", "core", "start"],
-        "systemctl": ["systemctl", "start", "home-assistant@homeassistant"],
-        "docker": ["docker", "start", "homeassistant"],
-    }
-    if method not in cmds:
+    if method not in HA_CONTROL_COMMANDS:
         return False
+    cmd = HA_CONTROL_COMMANDS[method][1]
     try:
-        subprocess.run(cmds[method], check=True, capture_output=True, timeout=60)
+        subprocess.run(cmd, check=True, timeout=60, **_QUIET)
         return True
-    except (subprocess.CalledProcessError, subprocess.TimeoutExpired):
+    except (
+        subprocess.CalledProcessError,
+        FileNotFoundError,
+        subprocess.TimeoutExpired,
+    ):
         return False
 
 
+def _prewarm_caches() -> None:
+    """Load the files most operations read, so they are cached already."""
+    for path in (ENTITY_REGISTRY, DEVICE_REGISTRY, CONFIG_ENTRIES):
+        try:
+            load_json(path)
+        except (FileNotFoundError, ValueError):
+            pass  # Reported by the operation that actually needs it
+    get_definition_ids()
+
+
+def _wait_for_ha_files() -> None:
+    """Wait until HA has let go of its files, at most HA_STOP_WAIT_SECONDS.
+
+    HA is released once the database has no -wal file left (SQLite removes
+    it when the last connection closes) and neither the database nor any
+    registry changed between two polls.
+    """
+    watched = (DB_PATH, ENTITY_REGISTRY, DEVICE_REGISTRY, CONFIG_ENTRIES)
+    wal_path = f"{DB_PATH}-wal"
+    deadline = time.monotonic() + HA_STOP_WAIT_SECONDS
+    previous: list[FileFingerprint | None] | None = None
+    while True:
+        current = [_fingerprint(path) for path in watched]
+        if current == previous and not os.path.lexists(wal_path):
+            return
+        if time.monotonic() >= deadline:
+            return
+        previous = current
+        time.sleep(HA_STOP_POLL_SECONDS)
+
+
 @contextmanager
 def ha_stopped() -> Generator[str | None, None, None]:
     """Context manager to stop and restart HA around operations.
@@ -302,11 +741,17 @@ def ha_stopped() -> Generator[str | None, None, None]:
             msg = "HA not stopped — operation aborted"
             raise RuntimeError(msg)
 
-    time.sleep(HA_STOP_WAIT_SECONDS)
+    # Parse the registries and definitions while HA settles. Only the cache
+    # is filled: a file HA still rewrites while shutting down just fails
+    # its fingerprint check later and is read again.
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        pool.submit(_prewarm_caches)
+        _wait_for_ha_files()
     try:
         yield method
     finally:
-        invalidate_cache()
+        # The caches stay: every entry is checked against the file's
+        # fingerprint, so anything HA rewrites after starting is re-read
         log("Starting Home Assistant...")
         if method:
             if not start_ha(method):
@@ -315,36 +760,68 @@ def ha_stopped() -> Generator[str | None, None, None]:
             log("Please start Home Assistant manually.")
 
 
+def _find_recorder_purge_days(content: bytes) -> int | None:
+    """Find purge_keep_days inside a recorder: block of YAML content.
+
+    A line scanner rather than a YAML parser (no PyYAML needed, and HA's
+    custom tags like !secret don't get in the way): it looks for a line
+    that is just "recorder:" at any indentation (so packages work), then
+    for purge_keep_days among the lines indented deeper, and stops at
+    the first line that isn't. Blank and comment lines are skipped.
+    """
+    block_indent: int | None = None  # Indentation of the recorder: line
+    for raw_line in content.splitlines():
+        stripped = raw_line.strip()
+        if not stripped or stripped.startswith(b"#"):
+            continue
+        indent = len(raw_line) - len(raw_line.lstrip())
+
+        if block_indent is not None:
+            if indent <= block_indent:
+                block_indent = None  # Left the recorder block
+            elif stripped.startswith(b"purge_keep_days:"):
+                value = stripped[len(b"purge_keep_days:"):].split(b"#", 1)[0]
+                value = value.strip().strip(b"\"'")
+                if value.isdigit():
+                    return int(value)
+                continue
+
+        key = stripped.split(b"#", 1)[0].rstrip()
+        if block_indent is None and key == b"recorder:":
+            block_indent = indent
+    return None
+
+
 def get_recorder_purge_days() -> int:
     """Get purge_keep_days from HA recorder config, fallback to default."""
-    # Try configuration.yaml first
+    # Try configuration.yaml first; its scan result is cached by fingerprint
     config_yaml = CONFIG_PATH / "configuration.yaml"
-    if config_yaml.exists():
+    fingerprint = _fingerprint(config_yaml)
+    cached = _purge_days_cache.get(config_yaml)
+    if fingerprint is None:
+        days = None
+    elif cached is not None and cached[0] == fingerprint:
+        days = cached[1]
+    else:
         try:
-            content = config_yaml.read_text(encoding="utf-8")
-            # Simple regex to find purge_keep_days in recorder section
-            # This handles most common YAML formats
-            match = re.search(
-                r"recorder:\s*\n(?:.*\n)*?\s+purge_keep_days:\s*(\d+)",
-                content,
-                re.MULTILINE,
-            )
-            if match:
-                return int(match.group(1))
-        except (OSError, ValueError):
-            pass
+            days = _find_recorder_purge_days(config_yaml.read_bytes())
+        except OSError:
+            days = None
+        else:
+            _purge_days_cache[config_yaml] = (fingerprint, days)
+    if days is not None:
+        return days
 
     # Try .storage/core.config_entries for recorder integration
-    if CONFIG_ENTRIES.exists():
-        try:
-            data = load_json(CONFIG_ENTRIES)
-            for entry in data.get("data", {}).get("entries", []):
-                if entry.get("domain") == "recorder":
-                    options = entry.get("options", {})
-                    if "purge_keep_days" in options:
-                        return int(options["purge_keep_days"])
-        except (FileNotFoundError, ValueError, KeyError):
-            pass
+    try:
+        data = load_json(CONFIG_ENTRIES)
+        for entry in data.get("data", {}).get("entries", []):
+            if entry.get("domain") == "recorder":
+                options = entry.get("options", {})
+                if "purge_keep_days" in options:
+                    return int(options["purge_keep_days"])
+    except (FileNotFoundError, ValueError, KeyError):
+        pass
 
     return DEFAULT_PURGE_DAYS
 
@@ -354,21 +831,70 @@ def get_recorder_purge_days() -> int:
 # ============================================================
 
 def extract_ids_from_yaml_file(path: Path) -> set[str]:
-    """Extract IDs from a YAML file using regex."""
+    """Extract IDs from a YAML file using regex.
+
+    Results are cached per file and reused while its fingerprint is unchanged.
+    """
     ids: set[str] = set()
-    if not path.exists():
+    fingerprint = _fingerprint(path)
+    if fingerprint is None:
         return ids
 
+    cached = _yaml_ids_cache.get(path)
+    if cached is not None and cached[0] == fingerprint:
+        return set(cached[1])
+
+    # Scan raw bytes with the pre-compiled pattern; only captures get decoded.
+    # Large files are scanned through a read-only mapping instead of a copy.
     try:
-        content = path.read_text(encoding="utf-8")
-        # Use pre-compiled pattern
-        for match in YAML_ID_PATTERN.finditer(content):
-            id_value = match.group(1).strip()
-            if id_value and not id_value.startswith("#"):
-                ids.add(id_value)
-    except OSError:
+        with path.open("rb") as f:
+            if fingerprint[1] >= YAML_MMAP_MIN_BYTES:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    found = YAML_ID_PATTERN.findall(mm)
+            else:
+                found = YAML_ID_PATTERN.findall(f.read())
+    except (OSError, ValueError):  # ValueError: emptied since the stat
+        return ids
+
+    for id_bytes in found:
+        id_value = id_bytes.decode("utf-8", errors="replace").strip()
+        if id_value and not id_value.startswith("#"):
+            ids.add(id_value)
+
+    _yaml_ids_cache[path] = (fingerprint, ids)
+    return set(ids)
+
+
+def _yaml_definition_files(folder_path: Path, yaml_file: str) -> list[Path]:
+    """List the YAML files that can hold definitions of one type.
+
+    That is every *.yaml in folder_path plus the root file in CONFIG_PATH
+    (missing files are fine, they yield no IDs).
+    """
+    paths: list[Path] = []
+    try:
+        # scandir + suffix test: no per-entry fnmatch like glob("*.yaml")
+        with os.scandir(folder_path) as it:
+            paths.extend(
+                Path(entry.path) for entry in it
+                if entry.name.endswith(".yaml")
+            )
+    except OSError:  # Missing folder (most configs have only some of them)
         pass
+    paths.append(CONFIG_PATH / yaml_file)
+    return paths
 
+
+def _storage_item_ids(storage_file: str) -> set[str]:
+    """Get the item IDs from a UI-managed .storage file."""
+    ids: set[str] = set()
+    try:
+        data = load_json(STORAGE_PATH / storage_file)
+        for item in data.get("data", {}).get("items", []):
+            if item.get("id"):
+                ids.add(item["id"])
+    except (FileNotFoundError, ValueError, KeyError):  # Missing file is fine
+        pass
     return ids
 
 
@@ -392,73 +918,107 @@ def get_entity_ids(
     """
     ids: set[str] = set()
 
-    # Check folder
-    if folder_path.exists():
-        for f in folder_path.glob("*.yaml"):
-            ids.update(extract_ids_from_yaml_file(f))
+    # Files are independent, so overlap their reads
+    yaml_files = _yaml_definition_files(folder_path, yaml_file)
+    with ThreadPoolExecutor(
+        max_workers=min(IO_WORKERS, len(yaml_files)),
+    ) as pool:
+        for file_ids in pool.map(extract_ids_from_yaml_file, yaml_files):
+            ids.update(file_ids)
+
+    ids.update(_storage_item_ids(storage_file))
+    return ids
 
-    # Check root YAML file
-    root_yaml = CONFIG_PATH / yaml_file
-    ids.update(extract_ids_from_yaml_file(root_yaml))
 
-    # Check UI-based storage
-    ui_storage = STORAGE_PATH / storage_file
-    if ui_storage.exists():
-        try:
-            data = load_json(ui_storage)
-            for item in data.get("data", {}).get("items", []):
-                if item.get("id"):
-                    ids.add(item["id"])
-        except (FileNotFoundError, ValueError, KeyError):
-            pass
+def get_definition_ids() -> dict[str, set[str]]:
+    """Get automation, script and scene IDs at once, keyed by platform.
+
+    Same sources as get_entity_ids(), but the YAML files of all three
+    types share one thread pool, so a config with one big folder and two
+    small ones doesn't wait on the big folder with a mostly idle pool.
+    """
+    tasks: list[tuple[str, Path]] = [
+        (platform, path)
+        for platform, (folder_path, yaml_file, _) in DEFINITION_SOURCES.items()
+        for path in _yaml_definition_files(folder_path, yaml_file)
+    ]
+    ids: dict[str, set[str]] = {}
+
+    with ThreadPoolExecutor(max_workers=min(IO_WORKERS, len(tasks))) as pool:
+        storage_futures = {
+            platform: pool.submit(_storage_item_ids, storage_file)
+            for platform, (_, _, storage_file) in DEFINITION_SOURCES.items()
+        }
+        file_results = pool.map(
+            extract_ids_from_yaml_file, [path for _, path in tasks],
+        )
+        for (platform, _), file_ids in zip(tasks, file_results, strict=True):
+            ids.setdefault(platform, set()).update(file_ids)
+        for platform, future in storage_futures.items():
+            ids.setdefault(platform, set()).update(future.result())
 
     return ids
 
 
 def get_automation_ids() -> set[str]:
     """Get all automation IDs from YAML files and UI storage."""
-    return get_entity_ids(
-        "automation", AUTOMATION_PATH, "automations.yaml", "automations",
-    )
+    return get_entity_ids("automation", *DEFINITION_SOURCES["automation"])
 
 
 def get_script_ids() -> set[str]:
     """Get all script IDs from YAML files and UI storage."""
-    return get_entity_ids("script", SCRIPT_PATH, "scripts.yaml", "scripts")
+    return get_entity_ids("script", *DEFINITION_SOURCES["script"])
 
 
 def get_scene_ids() -> set[str]:
     """Get all scene IDs from YAML files and UI storage."""
-    return get_entity_ids("scene", SCENE_PATH, "scenes.yaml", "scenes")
+    return get_entity_ids("scene", *DEFINITION_SOURCES["scene"])
 
 
 # ============================================================
 # Cleanup Functions
 # ============================================================
 
-def find_orphaned_entities() -> list[tuple[str, str, str]]:
+def find_orphaned_entities(
+    use_cache: bool = True,
+) -> tuple[list[tuple[str, str, str]], dict[str, Any]]:
     """Find entities with missing device, config_entry, or definition.
 
-    Returns list of tuples: (platform, entity_id, name)
+    Returns tuple of (orphans, cleaned_data): orphans is a list of
+    (platform, entity_id, name) tuples, cleaned_data the parsed entity
+    registry with those entities left out (empty dict if nothing was
+    loaded), built in the same pass so it can be saved as-is. The parsed
+    registry itself is not modified.
     """
     # Check required files exist
     if not ENTITY_REGISTRY.exists():
         log("⚠️  Entity registry not found, skipping orphan detection")
-        return []
+        return [], {}
     if not DEVICE_REGISTRY.exists():
         log("⚠️  Device registry not found, skipping orphan detection")
-        return []
+        return [], {}
     if not CONFIG_ENTRIES.exists():
         log("⚠️  Config entries not found, skipping orphan detection")
-        return []
+        return [], {}
 
-    try:
-        entity_data = load_json(ENTITY_REGISTRY)
-        device_data = load_json(DEVICE_REGISTRY)
-        config_data = load_json(CONFIG_ENTRIES)
-    except (FileNotFoundError, ValueError) as e:
-        log(f"⚠️  Error loading registry files: {e}")
-        return []
+    # All inputs are independent files: read them concurrently so disk
+    # latency (SD cards, network shares) overlaps instead of adding up
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        entity_future = pool.submit(load_json, ENTITY_REGISTRY, use_cache)
+        device_future = pool.submit(load_json, DEVICE_REGISTRY)
+        config_future = pool.submit(load_json, CONFIG_ENTRIES)
+        definitions_future = pool.submit(get_definition_ids)
+
+        try:
+            entity_data = entity_future.result()
+            device_data = device_future.result()
+            config_data = config_future.result()
+        except (FileNotFoundError, ValueError) as e:
+            log(f"⚠️  Error loading registry files: {e}")
+            return [], {}
+
+        # Get IDs for automation, script, scene (keyed by platform)
+        definition_ids = definitions_future.result()
 
     # Build lookup sets (use set comprehension for better performance)
     devices = {
@@ -468,51 +1028,48 @@ def find_orphaned_entities() -> list[tuple[str, str, str]]:
         e["entry_id"] for e in config_data.get("data", {}).get("entries", [])
     }
 
-    # Get IDs for automation, script, scene
-    automation_ids = get_automation_ids()
-    script_ids = get_script_ids()
-    scene_ids = get_scene_ids()
-
-    orphans = []
+    orphans: list[tuple[str, str, str]] = []
+    kept: list[dict[str, Any]] = []
+    orphans_append = orphans.append  # Local bindings for the hot loop
+    kept_append = kept.append
+    definition_ids_get = definition_ids.get
     for entity in entity_data.get("data", {}).get("entities", []):
-        platform = entity.get("platform", "")
-        entity_id = entity.get("entity_id", "")
-        device_id = entity.get("device_id")
-        config_entry_id = entity.get("config_entry_id")
-        unique_id = entity.get("unique_id")
-        name = entity.get("original_name", "")
-
-        is_orphan = False
-
-        # Check device reference
-        if device_id and device_id not in devices:
-            is_orphan = True
-
-        # Check config entry reference
-        if config_entry_id and config_entry_id not in config_entries:
-            is_orphan = True
-
-        # Special handling for automation/script/scene
-        # Additional check — does NOT override device/config orphan detection
-        if platform == "automation":
-            if unique_id and unique_id not in automation_ids:
-                is_orphan = True
-        elif platform == "script":
-            if unique_id and unique_id not in script_ids:
-                is_orphan = True
-        elif platform == "scene":
-            if unique_id and unique_id not in scene_ids:
-                is_orphan = True
-
-        if is_orphan:
-            orphans.append((platform, entity_id, name))
+        get = entity.get
+        device_id = get("device_id")
+        config_entry_id = get("config_entry_id")
+        platform = get("platform", "")
+
+        # Device and config entry references are always checked; the
+        # automation/script/scene definition check is additional and
+        # does NOT override them. Short-circuits on the first hit, and
+        # unique_id is only looked up for the three definition platforms
+        # (one dict lookup instead of comparing against each of them).
+        if (
+            (device_id and device_id not in devices)
+            or (config_entry_id and config_entry_id not in config_entries)
+            or ((ids := definition_ids_get(platform)) is not None
+                and (uid := get("unique_id")) and uid not in ids)
+        ):
+            # Display fields are only needed for the (rare) orphans
+            orphans_append(
+                (platform, get("entity_id", ""), get("original_name", ""))
+            )
+        else:
+            kept_append(entity)
 
-    return orphans
+    # Shallow-copy the containers instead of mutating the parsed registry
+    cleaned_data = {
+        **entity_data,
+        "data": {**entity_data.get("data", {}), "entities": kept},
+    }
+    return orphans, cleaned_data
 
 
 def cleanup_orphaned_entities(dry_run: bool = False) -> int:
     """Remove orphaned entities from registry."""
-    orphans = find_orphaned_entities()
+    # Real runs read the registry fresh (HA may have just written it on stop)
+    # and reuse that single parse for the rewrite below
+    orphans, cleaned_data = find_orphaned_entities(use_cache=dry_run)
 
     if not orphans:
         log("✓ No orphaned entities found")
@@ -527,18 +1084,9 @@ def cleanup_orphaned_entities(dry_run: bool = False) -> int:
     # Backup before modification
     backup_file(ENTITY_REGISTRY)
 
-    orphan_eids = {o[1] for o in orphans}
-    data = load_json(ENTITY_REGISTRY, use_cache=False)
-    original_count = len(data["data"]["entities"])
-    data["data"]["entities"] = [
-        e for e in data["data"]["entities"]
-        if e.get("entity_id") not in orphan_eids
-    ]
-    new_count = len(data["data"]["entities"])
-
-    save_json(ENTITY_REGISTRY, data)
-    log(f"✓ Removed {original_count - new_count} orphaned entities")
-    return original_count - new_count
+    save_json(ENTITY_REGISTRY, cleaned_data)
+    log(f"✓ Removed {len(orphans)} orphaned entities")
+    return len(orphans)
 
 
 def cleanup_deleted_items(dry_run: bool = False) -> int:
@@ -551,12 +1099,11 @@ def cleanup_deleted_items(dry_run: bool = False) -> int:
     ]
 
     for path, key in registries:
-        if not path.exists():
-            continue
-
         try:
             data = load_json(path)
-        except (FileNotFoundError, ValueError) as e:
+        except FileNotFoundError:
+            continue
+        except ValueError as e:
             log(f"⚠️  Error loading {path}: {e}")
             continue
 
@@ -568,8 +1115,8 @@ def cleanup_deleted_items(dry_run: bool = False) -> int:
                 log(f"Would clean {n} {key.replace('_', ' ')}")
             else:
                 backup_file(path)
-                data["data"][key] = []
-                save_json(path, data)
+                # Copy-on-write: the parsed registry is shared via the cache
+                save_json(path, {**data, "data": {**data["data"], key: []}})
                 log(f"✓ Cleaned {n} {key.replace('_', ' ')}")
             count += n
 
@@ -579,8 +1126,191 @@ def cleanup_deleted_items(dry_run: bool = False) -> int:
     return count
 
 
-def purge_database(dry_run: bool = False) -> tuple[int, int]:
-    """Purge old database records and vacuum."""
+@contextmanager
+def open_database(read_only: bool = False) -> Generator[sqlite3.Connection, None, None]:
+    """Open the recorder database tuned for maintenance, closing it on exit.
+
+    The connection is in autocommit mode (transactions are managed
+    explicitly, which also lets VACUUM run on it) and has
+    SQLITE_PURGE_PRAGMAS applied once. A read_only session opens the file
+    with mode=ro and changes nothing about it; otherwise SQLITE_WRITE_PRAGMAS
+    are applied too and the database stays locked until it is closed. It is
+    deliberately not kept open across operations: HA is restarted in between
+    and must not find this process still holding the database.
+    """
+    if read_only:
+        uri = f"{DB_PATH.absolute().as_uri()}?mode=ro"
+        conn = sqlite3.connect(uri, uri=True, isolation_level=None)
+    else:
+        conn = sqlite3.connect(DB_PATH, isolation_level=None)
+    try:
+        for pragma in SQLITE_PURGE_PRAGMAS + (() if read_only else SQLITE_WRITE_PRAGMAS):
+            conn.execute(pragma)
+        yield conn
+    finally:
+        conn.close()
+
+
+def _ensure_index(
+    cur: sqlite3.Cursor,
+    table: str,
+    column: str,
+    index_name: str,
+) -> bool:
+    """Create an index on table(column) unless one already leads with column.
+
+    Older databases can lack the timestamp indexes, turning every purge
+    query into a full table scan. Returns True if an index was created.
+    """
+    cur.execute(f"PRAGMA index_list({table})")
+    for index in cur.fetchall():
+        cur.execute(f'PRAGMA index_info("{index[1]}")')
+        if any(seqno == 0 and name == column for seqno, _cid, name in cur.fetchall()):
+            return False
+
+    log(f"Creating missing index on {table}.{column} (one-time)...")
+    cur.execute(f"CREATE INDEX IF NOT EXISTS {index_name} ON {table} ({column})")
+    cur.execute(f"ANALYZE {table}")
+    return True
+
+
+def _batched_delete(
+    cur: sqlite3.Cursor,
+    table: str,
+    column: str,
+    cutoff_ts: int,
+) -> int:
+    """Delete rows with column < cutoff_ts in PURGE_BATCH_SIZE chunks.
+
+    Each chunk is its own transaction, with a passive WAL checkpoint every
+    CHECKPOINT_EVERY_BATCHES chunks. Uses a rowid subquery because
+    DELETE ... LIMIT needs a non-default SQLite build.
+    """
+    delete_sql = (
+        f"DELETE FROM {table} WHERE rowid IN ("  # noqa: S608 — fixed identifiers
+        f"  SELECT rowid FROM {table}"
+        f"  WHERE {column} < ? LIMIT ?"
+        ")"
+    )
+    total_deleted = 0
+    for batch in itertools.count(1):
+        cur.execute("BEGIN IMMEDIATE")
+        cur.execute(delete_sql, (cutoff_ts, PURGE_BATCH_SIZE))
+        deleted = cur.rowcount
+        total_deleted += deleted
+        cur.execute("COMMIT")
+        if deleted < PURGE_BATCH_SIZE:
+            cur.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchall()
+            return total_deleted
+        if batch % CHECKPOINT_EVERY_BATCHES == 0:
+            cur.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchall()
+        log(f"  ... deleted {total_deleted:,} {table} so far")
+    return total_deleted  # Unreachable: itertools.count() never ends
+
+
+def _detach_legacy_event_ids(cur: sqlite3.Cursor, cutoff_ts: int) -> int:
+    """Clear legacy states.event_id references to events older than cutoff_ts.
+
+    Older HA schemas still carry states.event_id, a foreign key into events.
+    Like HA's own purge, the old events are walked in event_id ranges of
+    PURGE_BATCH_SIZE, one transaction each. Returns the number of states updated.
+    """
+    cur.execute("PRAGMA table_info(states)")
+    if not any(column[1] == "event_id" for column in cur.fetchall()):
+        return 0
+    cur.execute("SELECT 1 FROM states WHERE event_id IS NOT NULL LIMIT 1")
+    if cur.fetchone() is None:  # Current schemas keep the column, always NULL
+        return 0
+    # The unary + keeps SQLite from answering MAX() by walking the table
+    # back from its newest row: index-only on the time_fired_ts index
+    cur.execute(
+        "SELECT MAX(+event_id) FROM events WHERE time_fired_ts < ?", (cutoff_ts,),
+    )
+    max_event_id = cur.fetchone()[0]
+    if max_event_id is None:
+        return 0
+
+    log("Detaching legacy event references from states...")
+    total_updated = 0
+    for batch, low in enumerate(range(0, max_event_id, PURGE_BATCH_SIZE), 1):
+        cur.execute("BEGIN IMMEDIATE")
+        cur.execute(
+            "UPDATE states SET event_id = NULL WHERE event_id IN ("
+            "  SELECT event_id FROM events"
+            "  WHERE event_id > ? AND event_id <= ? AND time_fired_ts < ?"
+            ")",
+            (low, low + PURGE_BATCH_SIZE, cutoff_ts),
+        )
+        total_updated += cur.rowcount
+        cur.execute("COMMIT")
+        if batch % CHECKPOINT_EVERY_BATCHES == 0:
+            cur.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchall()
+    return total_updated
+
+
+def _delete_unreferenced(
+    cur: sqlite3.Cursor,
+    table: str,
+    column: str,
+    ref_table: str,
+) -> int:
+    """Delete rows in table whose column is no longer referenced by ref_table.
+
+    The live IDs are collected once into an indexed temp table. column must
+    be the table's INTEGER PRIMARY KEY, walked in ranges of PURGE_BATCH_SIZE
+    rows with one transaction each.
+    """
+    cur.execute("DROP TABLE IF EXISTS temp.live_ids")
+    cur.execute("CREATE TEMP TABLE live_ids (id INTEGER PRIMARY KEY)")
+    cur.execute(
+        f"INSERT OR IGNORE INTO temp.live_ids"  # noqa: S608 — fixed identifiers
+        f" SELECT {column} FROM {ref_table} WHERE {column} IS NOT NULL",
+    )
+
+    # Built once: every range reuses the cached prepared statements
+    range_end_sql = (
+        f"SELECT MAX({column}) FROM ("  # noqa: S608 — fixed identifiers
+        f"  SELECT {column} FROM {table}"
+        f"  WHERE {column} > ? ORDER BY {column} LIMIT ?"
+        ")"
+    )
+    delete_sql = (
+        f"DELETE FROM {table}"  # noqa: S608 — fixed identifiers
+        f" WHERE {column} > ? AND {column} <= ?"
+        f" AND {column} NOT IN (SELECT id FROM temp.live_ids)"
+    )
+
+    total_deleted = 0
+    low = 0  # Exclusive lower bound of the next key range (IDs are positive)
+    for batch in itertools.count(1):
+        # Upper key of the next PURGE_BATCH_SIZE rows (walks the primary key)
+        cur.execute(range_end_sql, (low, PURGE_BATCH_SIZE))
+        high = cur.fetchone()[0]
+        if high is None:
+            break
+        cur.execute("BEGIN IMMEDIATE")
+        cur.execute(delete_sql, (low, high))
+        total_deleted += cur.rowcount
+        cur.execute("COMMIT")
+        if batch % CHECKPOINT_EVERY_BATCHES == 0:
+            cur.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchall()
+        low = high
+
+    cur.execute("DROP TABLE temp.live_ids")
+    cur.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchall()
+    return total_deleted
+
+
+def purge_database(
+    dry_run: bool = False,
+    vacuum: bool = VACUUM_REQUESTED,
+) -> tuple[int, int]:
+    """Purge old database records, optionally followed by a full VACUUM.
+
+    Without vacuum, freed pages stay in the file for SQLite to reuse. If the
+    database uses auto_vacuum=INCREMENTAL, a bounded number of free pages is
+    still returned to the filesystem.
+    """
     if not DB_PATH.exists():
         log("✓ No database found, skipping")
         return (0, 0)
@@ -590,100 +1320,107 @@ def purge_database(dry_run: bool = False) -> tuple[int, int]:
 
     cutoff_ts = int((datetime.now(tz=None) - timedelta(days=purge_days)).timestamp())  # noqa: DTZ005 — local time intentional
 
-    # Batch size for large deletes (avoid locking DB for too long)
-    batch_size = 100_000
-
     try:
-        with sqlite3.connect(DB_PATH) as conn:
-            conn.execute("PRAGMA journal_mode=WAL")
+        with open_database(read_only=dry_run) as conn:
             cur = conn.cursor()
 
-            log("Counting old records...")
-            cur.execute(
-                "SELECT COUNT(*) FROM states WHERE last_updated_ts < ?",
-                (cutoff_ts,),
-            )
-            states = cur.fetchone()[0]
+            # Dry runs happen while HA is running: count only, change nothing
+            if dry_run:
+                log("Counting old records...")
+                cur.execute(
+                    "SELECT"
+                    " (SELECT COUNT(*) FROM states WHERE last_updated_ts < ?),"
+                    " (SELECT COUNT(*) FROM events WHERE time_fired_ts < ?)",
+                    (cutoff_ts, cutoff_ts),
+                )
+                states, events = cur.fetchone()
+                if states or events:
+                    log(
+                        f"Would purge {states:,} states, {events:,} events"
+                        f" older than {purge_days} days",
+                    )
+                else:
+                    log("✓ No old records to purge")
+                return (states, events)
+
+            for table, column, index_name in PURGE_INDEXES:
+                _ensure_index(cur, table, column, index_name)
+
+            # No pre-count: the DELETE row counts are the purge totals
+            log(f"Purging states and events older than {purge_days} days...")
+            states = _batched_delete(cur, "states", "last_updated_ts", cutoff_ts)
+            # Surviving states must not keep pointing at the events purged next
+            _detach_legacy_event_ids(cur, cutoff_ts)
+            events = _batched_delete(cur, "events", "time_fired_ts", cutoff_ts)
+
+            if not (states or events):
+                log("✓ No old records to purge")
+                return (0, 0)
+            log(f"Purged {states:,} states, {events:,} events")
 
-            cur.execute(
-                "SELECT COUNT(*) FROM events WHERE time_fired_ts < ?",
-                (cutoff_ts,),
+            # Clean attributes/event data no longer referenced
+            log("Cleaning orphaned attributes...")
+            _delete_unreferenced(
+                cur, "state_attributes", "attributes_id", "states",
             )
-            events = cur.fetchone()[0]
 
-            if states or events:
-                action = "Would purge" if dry_run else "Purging"
+            log("Cleaning orphaned event data...")
+            _delete_unreferenced(cur, "event_data", "data_id", "events")
+
+            cur.execute("PRAGMA auto_vacuum")
+            auto_vacuum = cur.fetchone()[0]
+            incremental = auto_vacuum == AUTO_VACUUM_INCREMENTAL
+            cur.execute("PRAGMA freelist_count")
+            free_pages = cur.fetchone()[0]
+            cur.execute("PRAGMA page_size")
+            free_mb = free_pages * cur.fetchone()[0] / (1024 * 1024)
+
+            if vacuum and auto_vacuum == AUTO_VACUUM_FULL:
                 log(
-                    f"{action} {states:,} states, {events:,} events"
-                    f" older than {purge_days} days",
+                    "✓ Database purged (auto_vacuum=FULL already returns"
+                    " free space, skipping VACUUM)",
                 )
-
-                if not dry_run:
-                    # Batch delete states
-                    total_deleted = 0
-                    while True:
-                        cur.execute(
-                            "DELETE FROM states WHERE rowid IN ("
-                            "  SELECT rowid FROM states"
-                            "  WHERE last_updated_ts < ? LIMIT ?"
-                            ")",
-                            (cutoff_ts, batch_size),
-                        )
-                        deleted = cur.rowcount
-                        total_deleted += deleted
-                        conn.commit()
-                        if deleted < batch_size:
-                            break
-                        log(f"  ... deleted {total_deleted:,}/{states:,} states")
-
-                    # Batch delete events
-                    total_deleted = 0
-                    while True:
-                        cur.execute(
-                            "DELETE FROM events WHERE rowid IN ("
-                            "  SELECT rowid FROM events"
-                            "  WHERE time_fired_ts < ? LIMIT ?"
-                            ")",
-                            (cutoff_ts, batch_size),
-                        )
-                        deleted = cur.rowcount
-                        total_deleted += deleted
-                        conn.commit()
-                        if deleted < batch_size:
-                            break
-                        log(f"  ... deleted {total_deleted:,}/{events:,} events")
-
-                    # Clean orphaned attributes using NOT IN with subquery
-                    log("Cleaning orphaned attributes...")
-                    cur.execute("""
-                        DELETE FROM state_attributes
-                        WHERE attributes_id NOT IN (
-                            SELECT DISTINCT attributes_id FROM states
-                            WHERE attributes_id IS NOT NULL
-                        )
-                    """)
-                    conn.commit()
-
-                    log("Cleaning orphaned event data...")
-                    cur.execute("""
-                        DELETE FROM event_data
-                        WHERE data_id NOT IN (
-                            SELECT DISTINCT data_id FROM events
-                            WHERE data_id IS NOT NULL
-                        )
-                    """)
-                    conn.commit()
-
-                    # Vacuum must run outside a transaction
-                    log("Running VACUUM (this may take a while on large databases)...")
-                    vacuum_conn = sqlite3.connect(DB_PATH, isolation_level=None)
-                    try:
-                        vacuum_conn.execute("VACUUM")
-                    finally:
-                        vacuum_conn.close()
-                    log("✓ Database purged and vacuumed")
+            elif vacuum and free_mb < VACUUM_MIN_FREE_MB:
+                log(
+                    f"✓ Database purged (only {free_mb:.1f} MB free"
+                    f" inside the file, skipping VACUUM)",
+                )
+            elif vacuum:
+                if not incremental:
+                    # Only takes effect through a VACUUM, so switch now: later
+                    # purges can then shrink the file without a full rewrite
+                    cur.execute(f"PRAGMA auto_vacuum={AUTO_VACUUM_INCREMENTAL}")
+                # Vacuum must run outside a transaction (autocommit mode)
+                log(
+                    f"Running VACUUM to reclaim {free_mb:.1f} MB"
+                    f" (this may take a while on large databases)...",
+                )
+                cur.execute("VACUUM")
+                log("✓ Database purged and vacuumed")
             else:
-                log("✓ No old records to purge")
+                if incremental:
+                    # Each freed page is one result row; drain to run fully
+                    cur.execute(
+                        f"PRAGMA incremental_vacuum({INCREMENTAL_VACUUM_PAGES})",
+                    ).fetchall()
+                    log("✓ Database purged (free pages returned incrementally)")
+                else:
+                    log("✓ Database purged (use --vacuum to also shrink the file)")
+                    # Explain the tradeoff when a VACUUM would clearly pay off
+                    cur.execute("PRAGMA page_count")
+                    free_ratio = free_pages / max(cur.fetchone()[0], 1)
+                    if (
+                        free_ratio > VACUUM_HINT_FREE_RATIO
+                        and free_mb >= VACUUM_MIN_FREE_MB
+                    ):
+                        log(
+                            f"  {free_ratio:.0%} of the database file"
+                            f" ({free_mb:.1f} MB) is free space, reused for new"
+                            f" recordings; --vacuum would give it back to the disk",
+                        )
+
+            # Refresh query planner statistics where they changed
+            cur.execute("PRAGMA optimize")
 
             return (states, events)
 
@@ -693,26 +1430,59 @@ def purge_database(dry_run: bool = False) -> tuple[int, int]:
 
 
 def cleanup_old_backups() -> int:
-    """Remove backup files older than BACKUP_RETENTION_DAYS."""
-    cutoff = (datetime.now(tz=None) - timedelta(days=BACKUP_RETENTION_DAYS)).timestamp()  # noqa: DTZ005 — local time intentional
+    """Remove backup files older than BACKUP_RETENTION_DAYS.
+
+    The newest BACKUP_KEEP_LAST backups of each file are always kept, so a
+    registry that hasn't been backed up in weeks still has a restore point.
+    A backup's age comes from the timestamp in its name: hard-linked (and
+    copy2'd) backups carry the source file's mtime, not the backup time.
+    """
+    cutoff_dt = datetime.now(tz=None) - timedelta(days=BACKUP_RETENTION_DAYS)  # noqa: DTZ005 — local time intentional
+    cutoff_stamp = cutoff_dt.strftime("%Y%m%d_%H%M%S")  # Fixed width: compares as a string
+    cutoff = cutoff_dt.timestamp()
     removed = 0
+    total_backups = 0
 
-    # Count total backup files
-    total_backups = len(list(STORAGE_PATH.glob("*.backup.*")))
+    # Count and group in a single directory pass (no Path objects needed):
+    # source file name -> [(timestamp suffix, path, expired)]
+    backups_by_source: dict[str, list[tuple[str, str, bool]]] = {}
+    try:
+        with os.scandir(STORAGE_PATH) as entries:
+            for entry in entries:
+                # Regular files only: never follow or delete through a symlink
+                try:
+                    if ".backup." not in entry.name or not entry.is_file(
+                        follow_symlinks=False,
+                    ):
+                        continue
+                    source, _, stamp = entry.name.partition(".backup.")
+                    if BACKUP_PATTERN.search(entry.name):
+                        expired = stamp < cutoff_stamp
+                    else:
+                        # No timestamp in the name: fall back to the mtime
+                        expired = entry.stat(follow_symlinks=False).st_mtime < cutoff
+                except OSError:
+                    continue
+                total_backups += 1
+                backups_by_source.setdefault(source, []).append(
+                    (stamp, entry.path, expired),
+                )
+    except OSError:
+        pass
 
-    # Batch collect files to remove (avoid multiple stat calls)
-    files_to_remove = []
-    for f in STORAGE_PATH.glob("*.backup.*"):
-        try:
-            if f.stat().st_mtime < cutoff:
-                files_to_remove.append(f)
-        except OSError:
-            pass
+    files_to_remove: list[str] = []
+    for backups in backups_by_source.values():
+        backups.sort(reverse=True)  # Newest first: timestamps sort as strings
+        files_to_remove.extend(
+            file_path
+            for _, file_path, expired in backups[BACKUP_KEEP_LAST:]
+            if expired
+        )
 
     # Remove collected files
-    for f in files_to_remove:
+    for file_path in files_to_remove:
         try:
-            f.unlink()
+            os.unlink(file_path)
             removed += 1
         except OSError:
             pass
@@ -738,63 +1508,134 @@ def cleanup_old_backups() -> int:
 # Restore Functions
 # ============================================================
 
+def _count_backup_entities(path: Path) -> int | None:
+    """Count the entities in a backup, or return None if it is corrupted."""
+    try:
+        data = load_json(path, use_cache=False)  # Don't cache backups
+        return len(data.get("data", {}).get("entities", []))
+    except (ValueError, KeyError):
+        return None
+
+
+def load_backup(backup_info: BackupInfo) -> dict[str, Any]:
+    """Load a backup chosen in the restore menu.
+
+    Kept in the in-memory cache (backups are never modified, so the
+    fingerprint stays valid), so previewing and then restoring the same
+    backup parses it once.
+    """
+    return load_json(backup_info.path)
+
+
 def scan_backup_files() -> list[BackupInfo]:
     """Scan .storage/ folder for backup files.
 
-    Returns list of BackupInfo sorted by timestamp (newest first).
+    Returns list of BackupInfo sorted by timestamp (newest first). Entity
+    counts are remembered across runs per backup fingerprint, so only new
+    or changed backups are parsed, concurrently (the parse and the read
+    both run outside the GIL for the most part).
     """
     backups = []
-
-    for backup_path in STORAGE_PATH.glob("*.backup.*"):
-        try:
-            # Get file stats once (optimization: avoid multiple stat() calls)
-            file_stat = backup_path.stat()
-
-            # Parse timestamp from filename using pre-compiled pattern
-            match = BACKUP_PATTERN.search(backup_path.name)
-            if not match:
-                # Fallback to file mtime if timestamp not in filename
-                timestamp = datetime.fromtimestamp(file_stat.st_mtime, tz=None)  # noqa: DTZ006 — local time intentional
-            else:
-                timestamp_str = match.group(1)
-                timestamp = datetime.strptime(timestamp_str, "%Y%m%d_%H%M%S")  # noqa: DTZ007 — local time intentional
-
-            # Determine file type
-            if "entity_registry" in backup_path.name:
-                file_type = "entity_registry"
-            elif "device_registry" in backup_path.name:
-                file_type = "device_registry"
+    cache_dir = _private_cache_dir()
+    counts_file = cache_dir / BACKUP_COUNTS_CACHE_NAME if cache_dir else None
+    # backup path -> (fingerprint, entity count or None if corrupted)
+    known_counts = (_read_private_cache(counts_file) if counts_file else None) or {}
+    counts: dict[str, tuple[FileFingerprint, int | None]] = {}
+
+    # One directory pass: names and file types come from readdir itself,
+    # so only actual backups cost a stat() (cached on the DirEntry)
+    try:
+        with os.scandir(STORAGE_PATH) as it:
+            backup_entries = [
+                entry for entry in it
+                if ".backup." in entry.name and entry.is_file(follow_symlinks=False)
+            ]
+    except OSError:
+        backup_entries = []
+
+    # Threads are only started for backups that actually need parsing
+    with ThreadPoolExecutor(max_workers=IO_WORKERS) as pool:
+        # (entry, stat, fingerprint, known count or pending count)
+        scanned: list[tuple[
+            os.DirEntry[str], os.stat_result, FileFingerprint, int | None | Future[int | None],
+        ]] = []
+        for entry in backup_entries:
+            try:
+                file_stat = entry.stat(follow_symlinks=False)
+            except OSError as e:
+                log(f"⚠️  Error reading backup {entry.name}: {e}")
+                continue
+            fingerprint = (file_stat.st_mtime_ns, file_stat.st_size, file_stat.st_ino)
+            known = known_counts.get(entry.path)
+            if known is not None and known[0] == fingerprint:
+                scanned.append((entry, file_stat, fingerprint, known[1]))
             else:
-                file_type = "unknown"
+                scanned.append((entry, file_stat, fingerprint, pool.submit(
+                    _count_backup_entities, Path(entry.path),
+                )))
 
-            # Load JSON and count entities
+        for entry, file_stat, fingerprint, count in scanned:
             try:
-                data = load_json(backup_path, use_cache=False)  # Don't cache backups
-                entity_count = len(data.get("data", {}).get("entities", []))
-            except (ValueError, KeyError):
-                # Corrupted file, skip
-                log(f"⚠️  Skipping corrupted backup: {backup_path.name}")
+                entity_count = count.result() if isinstance(count, Future) else count
+                counts[entry.path] = (fingerprint, entity_count)
+                if entity_count is None:
+                    # Corrupted file, skip
+                    log(f"⚠️  Skipping corrupted backup: {entry.name}")
+                    continue
+
+                # Parse timestamp from filename using pre-compiled pattern
+                match = BACKUP_PATTERN.search(entry.name)
+                if not match:
+                    # Fallback to file mtime if timestamp not in filename
+                    timestamp = datetime.fromtimestamp(file_stat.st_mtime, tz=None)  # noqa: DTZ006 — local time intentional
+                else:
+                    # YYYYMMDD_HHMMSS is ISO 8601 basic format once "_" becomes "T";
+                    # fromisoformat() parses it in C, without a format string
+                    timestamp = datetime.fromisoformat(match.group(1).replace("_", "T"))
+
+                # Determine file type (backups are named after their source file)
+                if entry.name.startswith("core.entity_registry."):
+                    file_type = "entity_registry"
+                elif entry.name.startswith("core.device_registry."):
+                    file_type = "device_registry"
+                else:
+                    file_type = "unknown"
+
+                # Calculate file size (use cached stat)
+                size_mb = file_stat.st_size / (1024 * 1024)
+
+                backups.append(BackupInfo(
+                    path=Path(entry.path),
+                    timestamp=timestamp,
+                    file_type=file_type,
+                    size_mb=size_mb,
+                    entity_count=entity_count,
+                ))
+
+            except (OSError, ValueError) as e:
+                log(f"⚠️  Error reading backup {entry.name}: {e}")
                 continue
 
-            # Calculate file size (use cached stat)
-            size_mb = file_stat.st_size / (1024 * 1024)
+    if counts_file and counts != known_counts:
+        _write_private_cache(counts_file, counts)  # Also drops removed backups
 
-            backups.append(BackupInfo(
-                path=backup_path,
-                timestamp=timestamp,
-                file_type=file_type,
-                size_mb=size_mb,
-                entity_count=entity_count,
-            ))
+    # Sort by timestamp (newest first); attrgetter and datetime comparison
+    # both run in C, so no Python-level call per element
+    backups.sort(key=attrgetter("timestamp"), reverse=True)
 
-        except (OSError, ValueError) as e:
-            log(f"⚠️  Error reading backup {backup_path.name}: {e}")
-            continue
+    return backups
 
-    # Sort by timestamp (newest first)
-    backups.sort(key=lambda b: b.timestamp, reverse=True)
 
-    return backups
+def _index_entities(registry_data: dict[str, Any]) -> dict[str, dict[str, Any]]:
+    """Map entity_id -> entity for a parsed entity registry.
+
+    The dict's keys() view doubles as the set of IDs, so callers don't
+    need a second pass to build one.
+    """
+    return {
+        e["entity_id"]: e
+        for e in registry_data.get("data", {}).get("entities", [])
+    }
 
 
 def compare_registries(
@@ -806,44 +1647,31 @@ def compare_registries(
     Returns EntityDiff with deleted, new, and modified entities.
     """
     # Build entity_id -> entity dict for both registries
-    backup_entities = {
-        e["entity_id"]: e
-        for e in backup_data.get("data", {}).get("entities", [])
-    }
-    current_entities = {
-        e["entity_id"]: e
-        for e in current_data.get("data", {}).get("entities", [])
-    }
-
-    backup_ids = set(backup_entities.keys())
-    current_ids = set(current_entities.keys())
-
-    # Find deleted entities (in backup but not in current)
-    deleted = [backup_entities[eid] for eid in (backup_ids - current_ids)]
-
-    # Find new entities (in current but not in backup)
-    new = [current_entities[eid] for eid in (current_ids - backup_ids)]
-
-    # Find modified entities (compare attributes for common entity_ids)
-    # Use set of attributes to compare for faster comparison
-    attrs_to_compare = {
-        "platform", "device_id", "config_entry_id",
-        "original_name", "disabled_by",
-    }
-    modified = []
-    common_ids = backup_ids & current_ids
-
-    for eid in common_ids:
-        backup_entity = backup_entities[eid]
-        current_entity = current_entities[eid]
-
-        # Quick comparison using any() for early exit
-        if any(
-            backup_entity.get(attr) != current_entity.get(attr)
-            for attr in attrs_to_compare
+    backup_entities = _index_entities(backup_data)
+    current_entities = _index_entities(current_data)
+
+    # One pass over the backup finds deleted (in backup but not in current)
+    # and modified entities; no intermediate ID sets, and both lists keep
+    # registry order. Attributes are compared as one tuple each, built by
+    # map() at C level instead of a generator of .get() pairs.
+    deleted: list[dict[str, Any]] = []
+    modified: list[tuple[dict[str, Any], dict[str, Any]]] = []
+    current_get = current_entities.get
+    for eid, backup_entity in backup_entities.items():
+        current_entity = current_get(eid)
+        if current_entity is None:
+            deleted.append(backup_entity)
+        elif tuple(map(backup_entity.get, ENTITY_COMPARE_ATTRS)) != tuple(
+            map(current_entity.get, ENTITY_COMPARE_ATTRS),
         ):
             modified.append((backup_entity, current_entity))
 
+    # Find new entities (in current but not in backup)
+    new = [
+        entity for eid, entity in current_entities.items()
+        if eid not in backup_entities
+    ]
+
     return EntityDiff(deleted=deleted, new=new, modified=modified)
 
 
@@ -851,7 +1679,7 @@ def preview_backup_diff(backup_info: BackupInfo) -> None:
     """Display differences between backup and current registry."""
     # Load backup and current registry
     try:
-        backup_data = load_json(backup_info.path, use_cache=False)
+        backup_data = load_backup(backup_info)
         current_data = load_json(ENTITY_REGISTRY)
     except (FileNotFoundError, ValueError) as e:
         log(f"⚠️  Error loading registries: {e}")
@@ -860,63 +1688,64 @@ def preview_backup_diff(backup_info: BackupInfo) -> None:
     # Compare registries
     diff = compare_registries(backup_data, current_data)
 
+    # The report can run to thousands of lines: collect it, print it once
+    lines: list[str] = []
+
     # Display backup metadata
-    print(f"\nBackup: {backup_info.path.name}")
-    print(f"Timestamp: {backup_info.timestamp.strftime('%Y-%m-%d %H:%M:%S')}")
-    print(f"Entities in backup: {backup_info.entity_count}")
-    print()
+    lines.append(f"\nBackup: {backup_info.path.name}")
+    lines.append(f"Timestamp: {backup_info.timestamp.strftime('%Y-%m-%d %H:%M:%S')}")
+    lines.append(f"Entities in backup: {backup_info.entity_count}")
+    lines.append("")
 
     # Display deleted entities
-    print("=" * 60)
-    print(f"DELETED ENTITIES (in backup but not in current): {len(diff.deleted)}")
-    print("=" * 60)
+    lines.append("=" * 60)
+    lines.append(f"DELETED ENTITIES (in backup but not in current): {len(diff.deleted)}")
+    lines.append("=" * 60)
     if diff.deleted:
         for i, entity in enumerate(diff.deleted, 1):
             entity_id = entity.get("entity_id", "unknown")
             platform = entity.get("platform", "unknown")
             name = entity.get("original_name", "")
-            print(f"  {i:2d}. {entity_id} ({platform})")
+            lines.append(f"  {i:2d}. {entity_id} ({platform})")
             if name:
-                print(f"      Name: {name}")
+                lines.append(f"      Name: {name}")
     else:
-        print("  None")
-    print()
+        lines.append("  None")
+    lines.append("")
 
     # Display new entities
-    print("=" * 60)
-    print(f"NEW ENTITIES (in current but not in backup): {len(diff.new)}")
-    print("=" * 60)
+    lines.append("=" * 60)
+    lines.append(f"NEW ENTITIES (in current but not in backup): {len(diff.new)}")
+    lines.append("=" * 60)
     if diff.new:
         for i, entity in enumerate(diff.new, 1):
             entity_id = entity.get("entity_id", "unknown")
             platform = entity.get("platform", "unknown")
-            print(f"  {i:2d}. {entity_id} ({platform})")
+            lines.append(f"  {i:2d}. {entity_id} ({platform})")
     else:
-        print("  None")
-    print()
+        lines.append("  None")
+    lines.append("")
 
     # Display modified entities
-    print("=" * 60)
-    print(f"MODIFIED ENTITIES: {len(diff.modified)}")
-    print("=" * 60)
+    lines.append("=" * 60)
+    lines.append(f"MODIFIED ENTITIES: {len(diff.modified)}")
+    lines.append("=" * 60)
     if diff.modified:
         for i, (backup_entity, current_entity) in enumerate(diff.modified, 1):
             entity_id = backup_entity.get("entity_id", "unknown")
-            print(f"  {i:2d}. {entity_id}")
+            lines.append(f"  {i:2d}. {entity_id}")
 
-            # Show what changed (use set for faster lookup)
-            attrs = {
-                "platform", "device_id", "config_entry_id",
-                "original_name", "disabled_by",
-            }
-            for attr in attrs:
+            # Show what changed
+            for attr in ENTITY_COMPARE_ATTRS:
                 backup_val = backup_entity.get(attr)
                 current_val = current_entity.get(attr)
                 if backup_val != current_val:
-                    print(f"      {attr}: {backup_val} → {current_val}")
+                    lines.append(f"      {attr}: {backup_val} → {current_val}")
     else:
-        print("  None")
-    print()
+        lines.append("  None")
+    lines.append("")
+
+    print("\n".join(lines))
 
 
 def selective_restore_entities(backup_info: BackupInfo, dry_run: bool = False) -> int:
@@ -926,7 +1755,7 @@ def selective_restore_entities(backup_info: BackupInfo, dry_run: bool = False) -
     """
     # Load backup and current registry
     try:
-        backup_data = load_json(backup_info.path, use_cache=False)
+        backup_data = load_backup(backup_info)
         current_data = load_json(ENTITY_REGISTRY)
     except (FileNotFoundError, ValueError) as e:
         log(f"⚠️  Error loading registries: {e}")
@@ -939,17 +1768,17 @@ def selective_restore_entities(backup_info: BackupInfo, dry_run: bool = False) -
         log("✓ No deleted entities to restore")
         return 0
 
-    # Display deleted entities with numbering
-    print(f"\nFound {len(diff.deleted)} deleted entities:")
-    print("=" * 60)
+    # Display deleted entities with numbering (collected, printed at once)
+    lines = [f"\nFound {len(diff.deleted)} deleted entities:", "=" * 60]
     for i, entity in enumerate(diff.deleted, 1):
         entity_id = entity.get("entity_id", "unknown")
         platform = entity.get("platform", "unknown")
         name = entity.get("original_name", "")
-        print(f"  [{i:2d}] {entity_id} ({platform})")
+        lines.append(f"  [{i:2d}] {entity_id} ({platform})")
         if name:
-            print(f"       Name: {name}")
-    print()
+            lines.append(f"       Name: {name}")
+    lines.append("")
+    print("\n".join(lines))
 
     # Prompt user for selection
     print("Enter selection:")
@@ -971,7 +1800,7 @@ def selective_restore_entities(backup_info: BackupInfo, dry_run: bool = False) -
         return 0
 
     # Get selected entities
-    selected_entities = [diff.deleted[i - 1] for i in sorted(indices)]
+    selected_entities = [diff.deleted[i - 1] for i in indices]
 
     # Display selected entities and confirm
     print(f"\nWill restore {len(selected_entities)} entities:")
@@ -993,6 +1822,14 @@ def selective_restore_entities(backup_info: BackupInfo, dry_run: bool = False) -
     log("Stopping Home Assistant...")
     try:
         with ha_stopped():
+            # Merge into the registry as HA left it on stop, which may be
+            # newer than the one compared above (a cache hit if unchanged)
+            try:
+                current_data = load_json(ENTITY_REGISTRY)
+            except (FileNotFoundError, ValueError) as e:
+                log(f"⚠️  Error loading registries: {e}")
+                return 0
+
             # Backup current registry
             backup_file(ENTITY_REGISTRY)
 
@@ -1000,7 +1837,7 @@ def selective_restore_entities(backup_info: BackupInfo, dry_run: bool = False) -
             current_entity_ids = {
                 e["entity_id"] for e in current_data["data"]["entities"]
             }
-            restored_count = 0
+            restored: list[dict[str, Any]] = []
 
             for entity in selected_entities:
                 entity_id = entity.get("entity_id")
@@ -1008,11 +1845,15 @@ def selective_restore_entities(backup_info: BackupInfo, dry_run: bool = False) -
                     log(f"⚠️  Skipping {entity_id} (already exists)")
                     continue
 
-                current_data["data"]["entities"].append(entity)
-                restored_count += 1
+                restored.append(entity)
+            restored_count = len(restored)
 
-            # Save registry
-            save_json(ENTITY_REGISTRY, current_data)
+            # Save registry (as a new dict: the parsed one is shared via the cache)
+            entities = [*current_data["data"]["entities"], *restored]
+            save_json(ENTITY_REGISTRY, {
+                **current_data,
+                "data": {**current_data["data"], "entities": entities},
+            })
             log(f"✓ Restored {restored_count} entities")
 
             return restored_count
@@ -1027,7 +1868,7 @@ def full_restore_registry(backup_info: BackupInfo, dry_run: bool = False) -> int
     """
     # Load and validate backup file
     try:
-        backup_data = load_json(backup_info.path, use_cache=False)
+        backup_data = load_backup(backup_info)
     except (FileNotFoundError, ValueError) as e:
         log(f"⚠️  Error loading backup: {e}")
         return 0
@@ -1082,7 +1923,7 @@ def full_restore_registry(backup_info: BackupInfo, dry_run: bool = False) -> int
             backup_file(ENTITY_REGISTRY)
 
             # Copy backup file to registry path
-            shutil.copy2(backup_info.path, ENTITY_REGISTRY)
+            replace_with_copy(backup_info.path, ENTITY_REGISTRY)
             log(f"✓ Restored {backup_entity_count} entities from backup")
 
             return backup_entity_count
@@ -1092,14 +1933,15 @@ def full_restore_registry(backup_info: BackupInfo, dry_run: bool = False) -> int
 
 def _print_backup_list(backups: list[BackupInfo]) -> None:
     """Print numbered list of backup files."""
-    print("\nAvailable backups:")
+    lines = ["\nAvailable backups:"]
     for i, backup in enumerate(backups, 1):
         ts = backup.timestamp.strftime("%Y-%m-%d %H:%M:%S")
-        print(
+        lines.append(
             f"  [{i}] {ts} - {backup.file_type}"
             f" ({backup.entity_count} entities)",
         )
-    print()
+    lines.append("")
+    print("\n".join(lines))
 
 
 def _select_backup(backups: list[BackupInfo]) -> BackupInfo | None:
@@ -1164,23 +2006,24 @@ def restore_menu() -> None:
                 log("No backup files found")
                 continue
 
-            print(f"\nFound {len(cached_backups)} backup files:")
-            print("=" * 60)
-            print(
+            lines = [
+                f"\nFound {len(cached_backups)} backup files:",
+                "=" * 60,
                 f"{'#':<4} {'Timestamp':<20} {'Type':<18}"
                 f" {'Entities':<10} {'Size (MB)':<10}",
-            )
-            print("-" * 60)
+                "-" * 60,
+            ]
 
             for i, backup in enumerate(cached_backups, 1):
                 timestamp_str = backup.timestamp.strftime("%Y-%m-%d %H:%M:%S")
-                print(
+                lines.append(
                     f"{i:<4} {timestamp_str:<20}"
                     f" {backup.file_type:<18}"
                     f" {backup.entity_count:<10}"
                     f" {backup.size_mb:<10.2f}",
                 )
-            print()
+            lines.append("")
+            print("\n".join(lines))
 
         elif choice == "2":
             # Preview backup differences
@@ -1208,7 +2051,6 @@ def restore_menu() -> None:
             if selected:
                 selective_restore_entities(selected)
                 cached_backups = None
-                invalidate_cache()
 
         elif choice == "4":
             # Full restore registry
@@ -1223,7 +2065,6 @@ def restore_menu() -> None:
             if selected:
                 full_restore_registry(selected)
                 cached_backups = None
-                invalidate_cache()
 
         else:
             print("Invalid option, try again.")
@@ -1251,32 +2092,33 @@ def find_suffix_entities() -> list[tuple[str, str, str]]:
     # Build set of all entity IDs for quick lookup
     all_entity_ids = {e.get("entity_id", "") for e in entities}
 
-    # Use pre-compiled pattern
     candidates = []
     for entity in entities:
         entity_id = entity.get("entity_id", "")
-        platform = entity.get("platform", "")
 
-        # Check if entity_id ends with numeric suffix (_2, _3, etc.)
-        match = DUPLICATE_SUFFIX_PATTERN.search(entity_id)
-        if not match:
+        # Most IDs don't end in a digit: reject those with one char test
+        if not entity_id or not entity_id[-1].isdecimal():
             continue
 
-        # Calculate base entity ID (without suffix)
-        suffix = match.group(0)  # e.g., "_2"
-        new_id = entity_id[:-len(suffix)]
+        # Numeric suffix after the last "_": _2.._9, or two or more digits
+        # (_10, _01, ...); _0 and _1 are not duplicate suffixes
+        new_id, sep, suffix = entity_id.rpartition("_")
+        if not sep or not suffix.isdecimal() or (
+            len(suffix) == 1 and suffix not in "23456789"
+        ):
+            continue
 
         # Only include if base entity does NOT exist
         if new_id in all_entity_ids:
             continue
 
-        candidates.append((entity_id, new_id, platform))
+        candidates.append((entity_id, new_id, entity.get("platform", "")))
 
     return candidates
 
 
-def parse_selection(selection: str, max_num: int) -> set[int]:
-    """Parse user selection string into set of indices.
+def parse_selection(selection: str, max_num: int) -> list[int]:
+    """Parse user selection string into ascending, distinct 1-based indices.
 
     Supports:
     - Single numbers: "1", "5"
@@ -1289,38 +2131,32 @@ def parse_selection(selection: str, max_num: int) -> set[int]:
 
     # Early return for special cases
     if selection in ("", "none", "n", "q"):
-        return set()
+        return []
 
     if selection == "all":
-        return set(range(1, max_num + 1))
+        return list(range(1, max_num + 1))
 
-    indices: set[int] = set()
+    # One flag byte per index: a range is a single slice assignment, and
+    # reading the flags back yields the indices already sorted
+    selected = bytearray(max_num + 1)
     parts = selection.replace(" ", "").split(",")
 
     for part in parts:
-        if not part:
+        # Whole part must be a number or a range: "x", "-2", "3-" are ignored
+        match = SELECTION_PART_PATTERN.fullmatch(part)
+        if not match:
             continue
+        start, end = match.groups()
+        # Clamped to valid bounds, so huge ranges stay cheap
+        try:
+            range_start = max(1, int(start))
+            range_end = min(max_num, int(end or start))
+        except ValueError:  # Beyond int()'s digit limit
+            continue
+        if range_start <= range_end:
+            selected[range_start:range_end + 1] = b"\x01" * (range_end - range_start + 1)
 
-        if "-" in part:
-            # Range: "1-5"
-            try:
-                range_parts = part.split("-", 1)
-                range_start = max(1, int(range_parts[0]))
-                range_end = min(max_num, int(range_parts[1]))
-                if range_start <= range_end:
-                    indices.update(range(range_start, range_end + 1))
-            except ValueError:
-                pass
-        else:
-            # Single number
-            try:
-                num = int(part)
-                if 1 <= num <= max_num:
-                    indices.add(num)
-            except ValueError:
-                pass
-
-    return {i for i in indices if 1 <= i <= max_num}
+    return [i for i, flag in enumerate(selected) if flag]
 
 
 def fix_entity_suffix(dry_run: bool = False) -> int:
@@ -1347,9 +2183,11 @@ def fix_entity_suffix(dry_run: bool = False) -> int:
     print("=" * 60)
     print()
 
-    for i, (old_id, new_id, platform) in enumerate(candidates, 1):
-        print(f"  [{i:2d}] {old_id}")
-        print(f"       -> {new_id} ({platform})")
+    # One print for the whole candidate list, however long
+    print("\n".join(
+        f"  [{i:2d}] {old_id}\n       -> {new_id} ({platform})"
+        for i, (old_id, new_id, platform) in enumerate(candidates, 1)
+    ))
 
     print()
     print("Enter selection:")
@@ -1371,7 +2209,7 @@ def fix_entity_suffix(dry_run: bool = False) -> int:
         return 0
 
     # Get selected fixes
-    selected_fixes = [candidates[i - 1] for i in sorted(indices)]
+    selected_fixes = [candidates[i - 1] for i in indices]
 
     print(f"\nWill fix {len(selected_fixes)} entities:")
     for old_id, new_id, _platform in selected_fixes:
@@ -1384,15 +2222,23 @@ def fix_entity_suffix(dry_run: bool = False) -> int:
     # Backup before modification
     backup_file(ENTITY_REGISTRY)
 
+    # Cache hit unless HA changed the file since find_suffix_entities() read it
     data = load_json(ENTITY_REGISTRY)
     fix_map = {old: new for old, new, _ in selected_fixes}
+    fix_get = fix_map.get
+
+    # Copy-on-write: only renamed entities are copied, the rest are shared.
+    # One dict.get per entity does both the membership test and the lookup.
+    entities = [
+        entity if (new_id := fix_get(entity.get("entity_id"))) is None
+        else {**entity, "entity_id": new_id}
+        for entity in data["data"]["entities"]
+    ]
 
-    for entity in data["data"]["entities"]:
-        entity_id = entity.get("entity_id")
-        if entity_id in fix_map:
-            entity["entity_id"] = fix_map[entity_id]
-
-    save_json(ENTITY_REGISTRY, data)
+    save_json(ENTITY_REGISTRY, {
+        **data,
+        "data": {**data["data"], "entities": entities},
+    })
     log(f"✓ Fixed {len(selected_fixes)} entity suffixes")
     return len(selected_fixes)
 
@@ -1453,11 +2299,16 @@ def run_with_ha_restart(
     log("Stopping Home Assistant...")
     try:
         with ha_stopped():
-            for op in operations:
-                try:
-                    op(dry_run=False)
-                except (OSError, ValueError, sqlite3.Error) as e:
-                    log(f"⚠️  Error in {op.__name__}: {e}")
+            # One backup and one write per registry, however many ops touch it
+            try:
+                with registry_batch():
+                    for op in operations:
+                        try:
+                            op(dry_run=False)
+                        except (OSError, ValueError, sqlite3.Error) as e:
+                            log(f"⚠️  Error in {op.__name__}: {e}")
+            except ValueError as e:
+                log(f"⚠️  Error saving registries: {e}")
 
             cleanup_old_backups()
 